@@ -1,36 +1,49 @@
-# config.py - v4.4.6 (Debug Print for Device Name)
+# config.py - v4.4.6 (Device Name printed once by main.py boot banner)
+# NOTE: Keep this module free of side effects (no prints or I/O at import) so it
+# can be precompiled with mpy-cross or frozen into firmware. Boot-time info
+# (e.g. the generated device name) is printed/logged by main.py instead.
 
-# --- Add these imports at the very top ---
-import machine
-import binascii
+import micropython
+from micropython import const
 
 VERSION = "4.4.6"
 
 # ---------------------------------------------------------------------------
 # Hardware Configuration
 # ---------------------------------------------------------------------------
-PIN_NEOPIXEL = 5
-NUM_PIXELS = 96
+# Integer hardware constants are declared with const() so the compiler folds them
+# into bytecode wherever they are used inside this module.
+PIN_NEOPIXEL = const(5)
+NUM_PIXELS = const(96)
+# Drive the strip from a PIO state machine fed by DMA (pio_neopixel.py) instead of the
+# CPU bit-banged neopixel driver, which blocks BLE interrupts for the whole frame
+NEOPIXEL_USE_PIO_DMA = True
+NEOPIXEL_PIO_SM = 0
 
 # --- I2C and Sensor Configuration ---
-I2C_ID = 1
-I2C_SCL_PIN = 27
-I2C_SDA_PIN = 26
-I2C_FREQUENCY = 100000
+I2C_ID = const(1)
+I2C_SCL_PIN = const(27)
+I2C_SDA_PIN = const(26)
+I2C_FREQUENCY = const(400000)  # Fast-mode; SCD4X, MPL3115A2 and VEML7700 all support it
 
 # --- Sensor Enable Flags & Addresses ---
 SCD4X_ENABLED = True
-SCD4X_I2C_ADDR = 0x62
+SCD4X_I2C_ADDR = const(0x62)
 MPL3115A2_ENABLED = True
-MPL3115A2_I2C_ADDR = 0x60
+MPL3115A2_I2C_ADDR = const(0x60)
 VEML7700_ENABLED = True
-VEML7700_I2C_ADDR = 0x10
+VEML7700_I2C_ADDR = const(0x10)
 
 # --- Sensor Timing ---
 # CRITICAL: Delay for SCD4x sensor to stabilize after starting. Used by unified_sensor.py.
 SENSOR_INIT_DELAY_S = 5
-# How often the main loop reads all sensors (in milliseconds)
-SENSOR_READ_INTERVAL_MS = 300000  # 5 minutes
+# How often the main loop polls the sensor manager (in milliseconds).
+# Keep this at (or below) the fastest per-sensor interval below.
+SENSOR_READ_INTERVAL_MS = 60000  # 1 minute
+# Per-sensor read cadence; a sensor is only read on a poll once its interval has elapsed
+SCD4X_READ_INTERVAL_MS = 300000  # 5 minutes
+MPL3115A2_READ_INTERVAL_MS = 300000  # 5 minutes
+VEML7700_READ_INTERVAL_MS = 60000  # 1 minute
 # Optional delay after all sensors are initialized in main.py
 SENSOR_POST_INIT_DELAY_MS = 1000 # 1 second
 
@@ -38,24 +51,51 @@ SENSOR_POST_INIT_DELAY_MS = 1000 # 1 second
 # Bluetooth Settings
 # ---------------------------------------------------------------------------
 # --- Generate a unique device name from the Pico's hardware ID ---
-# Get the unique ID (returns bytes), convert to hex, and decode to a string
-unique_id_hex = binascii.hexlify(machine.unique_id()).decode('utf-8')
-# Create a name like "Pico-e6648f03" using the first 8 characters of the ID
-BT_DEVICE_NAME = f"Pico-{unique_id_hex[:8]}"
+# Computed lazily (and cached) so `import config` stays cheap; the hexlify work
+# only happens once, when BLE actually needs the name.
+_BT_DEVICE_NAME = None
 
-# --- ADD THIS LINE FOR DEBUGGING ---
-print("INFO [config.py]: Generated BT_DEVICE_NAME =", BT_DEVICE_NAME)
-# ------------------------------------
+def get_bt_device_name():
+    """Returns a name like "Pico-e6648f03" built from the first 8 hex chars of the unique ID."""
+    global _BT_DEVICE_NAME
+    if _BT_DEVICE_NAME is None:
+        import machine, binascii
+        _BT_DEVICE_NAME = "Pico-" + binascii.hexlify(machine.unique_id())[:8].decode()
+    return _BT_DEVICE_NAME
 
-BT_ADV_INTERVAL_US = 100000
+# Advertise fast for a window after boot/disconnect for quick discovery, then
+# fall back to the slow interval. Keep SLOW at or below 100 ms: longer
+# connectable advertising intervals are unreliable on the Pico W's cyw43 driver.
+BT_ADV_INTERVAL_FAST_US = 30000
+BT_ADV_INTERVAL_SLOW_US = 100000
+BT_ADV_FAST_WINDOW_MS = 30000
+# Preferred connection interval range, advertised to the central as a hint
+# (AD type 0x12) in units of 1.25 ms: 6 = 7.5 ms, 12 = 15 ms.
+# MicroPython has no peripheral-side connection parameter update call.
+BT_PREFERRED_CONN_INTERVAL_MIN = 6
+BT_PREFERRED_CONN_INTERVAL_MAX = 12
+# Largest ATT MTU to accept/request; the status bundle fits one notification at 247
+BT_MTU = 247
 
 # --- Bluetooth UUIDs (MUST MATCH WEB UI) ---
-BLE_SERVICE_UUID = "19b10000-e8f2-537e-4f6c-d104768a1214"
-BLE_RECIPE_CHAR_UUID = "19b10001-e8f2-537e-4f6c-d104768a1214"
-BLE_CUSTOM_CHAR_UUID = "19b10002-e8f2-537e-4f6c-d104768a1214"
-BLE_CONTROL_CHAR_UUID = "19b10003-e8f2-537e-4f6c-d104768a1214"
-BLE_COMBINED_SENSOR_CHAR_UUID = "a1b2c3d4-e5f6-4789-a0b1-c2d3e4f5a601"
-BLE_SCHEDULE_CHAR_UUID = "12345678-1234-1234-1234-123456789abd"
+# Built once as shared bluetooth.UUID objects from the pre-parsed 16-byte
+# little-endian form, so nothing re-parses 36-char strings at service registration.
+def _u(s):
+    import binascii, bluetooth
+    return bluetooth.UUID(bytes(reversed(binascii.unhexlify(s.replace('-', '')))))
+
+BLE_SERVICE_UUID = _u("19b10000-e8f2-537e-4f6c-d104768a1214")
+BLE_RECIPE_CHAR_UUID = _u("19b10001-e8f2-537e-4f6c-d104768a1214")
+BLE_CUSTOM_CHAR_UUID = _u("19b10002-e8f2-537e-4f6c-d104768a1214")
+BLE_CONTROL_CHAR_UUID = _u("19b10003-e8f2-537e-4f6c-d104768a1214")
+BLE_COMBINED_SENSOR_CHAR_UUID = _u("a1b2c3d4-e5f6-4789-a0b1-c2d3e4f5a601")
+BLE_SCHEDULE_CHAR_UUID = _u("12345678-1234-1234-1234-123456789abd")
+del _u
+
+# --- Combined Sensor Payload (MUST MATCH WEB UI) ---
+# Little-endian float32: temperature C, humidity %, CO2 ppm, pressure hPa, lux.
+# A missing reading is sent as NaN. 20 bytes fits a single default-MTU notification.
+SENSOR_PACK_FMT = "<fffff"
 
 # ---------------------------------------------------------------------------
 # Light & Schedule Settings
@@ -71,27 +111,106 @@ LIGHT_RECIPES = {
     'aquarium': (0, 200, 255, 50), 'night_light': (50, 20, 0, 30),
     'inspection': (255, 255, 255, 255),
 }
-RECIPE_CODES = {
-    'off': 0, 'warm': 1, 'cool': 2, 'aquarium': 3, 'veg_growth': 4, 'sunset': 5, 'balanced': 6,
-    'daylight': 7, 'bloom': 8, 'seedling': 9, 'succulent': 10, 'purple_glow': 11, 'sunrise': 12,
-    'forest': 13, 'night_light': 14, 'inspection': 15
-}
-CODE_TO_RECIPE = {v: k for k, v in RECIPE_CODES.items()}
+# Recipe code == index into this tuple (MUST MATCH WEB UI).
+RECIPE_NAMES = (
+    'off', 'warm', 'cool', 'aquarium', 'veg_growth', 'sunset', 'balanced',
+    'daylight', 'bloom', 'seedling', 'succulent', 'purple_glow', 'sunrise',
+    'forest', 'night_light', 'inspection',
+)
+
+# Reverse map built once so name -> code is a hash lookup instead of a tuple scan
+_RECIPE_CODES = {name: i for i, name in enumerate(RECIPE_NAMES)}
+_NUM_RECIPES = len(RECIPE_NAMES)
+
+def code_to_recipe(code):
+    """Returns the recipe name for a code, or 'off' if the code is unknown."""
+    return RECIPE_NAMES[code] if 0 <= code < _NUM_RECIPES else 'off'
+
+def recipe_to_code(name):
+    """Returns the code for a recipe name, or None if the name is unknown."""
+    return _RECIPE_CODES.get(name)
+
+# --- Packed Recipe Table ---
+# Recipe codes are dense (0..N-1), so all recipes are packed into one immutable
+# bytes object of 4 channels per code. This replaces the dict-of-tuples at runtime.
+_RECIPE_TABLE = bytes(b for name in RECIPE_NAMES for b in LIGHT_RECIPES[name])
+del LIGHT_RECIPES
+
+@micropython.native
+def recipe_rgbw(code):
+    """Returns the (R, G, B, W) tuple for a recipe code."""
+    o = code * 4
+    return _RECIPE_TABLE[o], _RECIPE_TABLE[o + 1], _RECIPE_TABLE[o + 2], _RECIPE_TABLE[o + 3]
 
 # --- Advanced Schedule Settings ---
-SCHEDULE_STORAGE_FILE = "schedule.json"
-MAX_SCHEDULE_BLOCKS = 20
-SCHEDULE_CHECK_INTERVAL_MS = 30000
+# Schedule is stored as packed binary: one header followed by one record per block.
+SCHEDULE_STORAGE_FILE = "schedule.bin"
+SCHEDULE_LEGACY_JSON_FILE = "schedule.json"  # Migrated to SCHEDULE_STORAGE_FILE on first load
+SCHEDULE_HDR_FMT = "<BBB"   # version, enabled, num_blocks
+SCHEDULE_HDR_SIZE = const(3)
+SCHEDULE_REC_FMT = "<HHBB"  # start_min, end_min, recipe_code, enabled
+SCHEDULE_REC_SIZE = const(6)
+MAX_SCHEDULE_BLOCKS = const(20)
+# The schedule task sleeps until the next block start/end; this caps each sleep so
+# drift or an RTC change is still picked up
+SCHEDULE_CHECK_INTERVAL_MS = 600000
+# Opt-in power saving: while the strip is dark and no central is connected, schedule gaps of at
+# least LIGHTSLEEP_MIN_MS are spent in machine.lightsleep() with BLE powered down (the CYW43 link
+# can't be serviced during lightsleep). Every task stalls for the whole sleep, up to
+# SCHEDULE_CHECK_INTERVAL_MS: the device can't be found or connected to, and sensor reads, CSV
+# rows and event-log writes are suspended until it wakes.
+LIGHTSLEEP_WHEN_OFF = False
+LIGHTSLEEP_MIN_MS = 60000
 SCHEDULE_RESUME_AFTER_MANUAL = True
 SCHEDULE_RESUME_DELAY_SEC = 300
-FADE_DURATION = 3.0
-SCHEDULE_TRANSITION_FADE_SEC = 3.0
+# Fade timings are integer milliseconds end-to-end (no soft-float on the RP2040)
+FADE_DURATION_MS = const(3000)
+SCHEDULE_TRANSITION_FADE_MS = 3000
+FADE_STEP_MS = const(50)  # 20 steps per second
+# Recipe-to-recipe fade ramps kept in RAM (FADE_TOTAL_STEPS * 4 bytes each); 0 disables the cache
+FADE_RAMP_CACHE_SIZE = 8
+# Derived once at import so the fade loop does no per-step arithmetic
+FADE_TOTAL_STEPS = const(FADE_DURATION_MS // FADE_STEP_MS)
+# 8.8 fixed-point blend weight per fade step (last step == 256, i.e. exactly the target)
+_FADE_WEIGHTS = tuple(256 * (i + 1) // FADE_TOTAL_STEPS for i in range(FADE_TOTAL_STEPS))
+
+@micropython.native
+def make_fade_ramp(from_rgbw, to_rgbw):
+    """Returns a bytearray of FADE_TOTAL_STEPS interpolated (R,G,B,W) frames, ending on to_rgbw."""
+    ramp = bytearray(FADE_TOTAL_STEPS * 4)
+    o = 0
+    for w in _FADE_WEIGHTS:
+        inv = 256 - w
+        for ch in range(4):
+            ramp[o + ch] = (from_rgbw[ch] * inv + to_rgbw[ch] * w) >> 8
+        o += 4
+    return ramp
 
 # ---------------------------------------------------------------------------
 # System & Logging
 # ---------------------------------------------------------------------------
-MAIN_LOOP_DELAY_MS = 200
+# The main loop is event driven (uasyncio); each periodic job sleeps on its own interval.
+# BLE disconnects wake the advertising task immediately; this is the retry interval
+# after advertising failed to (re)start
+BT_RESTART_CHECK_INTERVAL_MS = 5000
+# Run gc.collect() on a fixed interval
+GC_INTERVAL_MS = 10000
+# Skip the periodic collect if less than this much was allocated since the last one
+GC_MIN_NEW_ALLOC_BYTES = 4096
+# Collect (and retune the GC threshold) right before (re)starting BLE advertising
+GC_FORCE_BEFORE_ADV = True
 LOGS_DIRECTORY = "/logs"
-LOG_EVENT_FILE = f"{LOGS_DIRECTORY}/pico_log.txt"
+LOG_EVENT_FILE = LOGS_DIRECTORY + "/pico_log.txt"
+# Event log lines are buffered in RAM and written by a background task once this many bytes
+# accumulate or every LOG_FLUSH_INTERVAL_MS; ERROR/FATAL events are written immediately.
+LOG_FLUSH_BYTES = 1024
+LOG_FLUSH_INTERVAL_MS = 10000
+# Log every BLE write/notification; off in production, since each entry formats a line in the BLE handler
+DEBUG = False
 SENSOR_LIGHT_LOG_FILE = "sensor_light_log.csv"
-CSV_LOG_INTERVAL_MS = 300000
\ No newline at end of file
+SENSOR_LIGHT_LOG_PATH = LOGS_DIRECTORY + "/" + SENSOR_LIGHT_LOG_FILE
+# A CSV row is written at least every CSV_LOG_INTERVAL_MS; in between, only when a reading
+# moves by more than its CSV_CHANGE_THRESHOLDS entry, and never more often than CSV_MIN_INTERVAL_MS.
+CSV_LOG_INTERVAL_MS = 300000
+CSV_MIN_INTERVAL_MS = 60000
+CSV_CHANGE_THRESHOLDS = (0.5, 2.0, 50, 1.0, 50.0)  # temp C, humidity %, CO2 ppm, pressure hPa, lux
\ No newline at end of file
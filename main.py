@@ -7,7 +7,8 @@ which is how the data is already formatted. This is the definitive fix.
 """
 
 # --- Standard Library Imports ---
-import gc, io, json, os, struct, sys, time, machine
+import gc, os, struct, time, machine
+import uasyncio as asyncio
 
 # --- Third-Party/Custom Imports ---
 import bluetooth, neopixel, config
@@ -26,34 +27,104 @@ except Exception as e:
 # ---------------------------------------------------------------------------
 light_controller, ble_controller, sensor_manager, rtc = None, None, None, machine.RTC()
 event_log_file_handle = None
+_log_buf = bytearray()
+_LOG_FLUSH_CATEGORIES = ("ERROR", "ERROR-TRACE", "FATAL")
+csv_log_file_handle = None
 ble_needs_restart = False
-current_schedule = {"version": 1, "enabled": True, "blocks": []}
-schedule_active_block = None
+ble_event = asyncio.ThreadSafeFlag()  # Set from the BLE IRQ to wake ble_task immediately
+schedule_event = asyncio.ThreadSafeFlag()  # Set when the schedule or RTC changes so schedule_task recomputes its sleep
+light_event = asyncio.ThreadSafeFlag()  # Set when a recipe/colour is requested so LightController.run() applies it
+log_event_flag = asyncio.ThreadSafeFlag()  # Set when the event log buffer is full so log_task writes it out
+# The schedule lives in RAM as the same flat image stored in config.SCHEDULE_STORAGE_FILE:
+# a SCHEDULE_HDR_FMT header (version, enabled, num_blocks) followed by SCHEDULE_REC_FMT records.
+current_schedule = bytearray(b'\x01\x01\x00')
+schedule_active_block = None  # Index into current_schedule, or None
 last_schedule_check_time = 0
-schedule_override_until_ms = 0
+schedule_override_until_ms = None  # ticks_ms deadline of a manual override, or None
+last_csv_log_ms = None
+_last_csv_values = None
+_cached_dt, _cached_dt_ms = None, 0
+_cached_mem, _cached_mem_ms = None, 0
+
+# Hot config values hoisted to module globals: one global lookup instead of global + module attribute
+_SCHED_HDR_SIZE, _SCHED_REC_SIZE = config.SCHEDULE_HDR_SIZE, config.SCHEDULE_REC_SIZE
+_FADE_TOTAL_STEPS = config.FADE_TOTAL_STEPS
+_RECIPE_COUNT = len(config.RECIPE_NAMES)
+_OFF_CODE = config.recipe_to_code('off')
+_DEBUG = config.DEBUG
+# Optional settings resolved once here rather than with getattr() on every BLE command / schedule change
+_SCHEDULE_FADE_MS = getattr(config, 'SCHEDULE_TRANSITION_FADE_MS', config.FADE_DURATION_MS)
+_LIGHTSLEEP_WHEN_OFF = getattr(config, 'LIGHTSLEEP_WHEN_OFF', False)
+_RESUME_AFTER_MANUAL = getattr(config, 'SCHEDULE_RESUME_AFTER_MANUAL', True)
+_RESUME_DELAY_MS = getattr(config, 'SCHEDULE_RESUME_DELAY_SEC', 300) * 1000
+_ACTIVE_RECIPE = config.ACTIVE_RECIPE if config.recipe_to_code(config.ACTIVE_RECIPE) is not None else 'balanced'
+
+# --- BLE Wire Formats ---
+_FMT_SCHED_BLOCK = "!BBBBBB"  # start_h, start_m, end_h, end_m, recipe_code, enabled
+_FMT_RTC_SET = "<HBBBBBB"     # year, month, day, hour, minute, second, js_weekday
+_FMT_MEM = "<BI"              # 121, free bytes
+_FMT_TIME = "<BHBBBBBB"       # 131, year, month, day, hour, minute, second, js_weekday
+_NAN = float('nan')
 last_sensor_read_ms, last_temp_c, last_humidity, last_co2, last_pressure, last_lux = 0, None, None, None, None, None
 
 # ---------------------------------------------------------------------------
 # Helper and Logging Functions
 # ---------------------------------------------------------------------------
+def get_now():
+    """Returns rtc.datetime(), memoized for up to 500 ms so bursts of loggers/notifiers share one read."""
+    global _cached_dt, _cached_dt_ms
+    t = time.ticks_ms()
+    if _cached_dt is None or time.ticks_diff(t, _cached_dt_ms) > 500:
+        _cached_dt = rtc.datetime(); _cached_dt_ms = t
+    return _cached_dt
+
+def invalidate_now():
+    global _cached_dt
+    _cached_dt = None
+
+def mem_free_cached():
+    """Returns gc.mem_free(), memoized for up to 500 ms; the heap walk is skipped during status bursts."""
+    global _cached_mem, _cached_mem_ms
+    t = time.ticks_ms()
+    if _cached_mem is None or time.ticks_diff(t, _cached_mem_ms) > 500:
+        _cached_mem = gc.mem_free(); _cached_mem_ms = t
+    return _cached_mem
+
+def format_traceback(e):
+    # io/sys are only needed on this error path, so they're imported here rather than at module load
+    import io, sys
+    s = io.StringIO(); sys.print_exception(e, s)
+    return s.getvalue()
+
 def ensure_directory(dir_path):
-    try: os.stat(dir_path)
+    # mkdir directly: EEXIST (17) is the common case, so no separate os.stat() probe is needed
+    try: os.mkdir(dir_path); log_event("SYSTEM", f"Created directory: {dir_path}")
     except OSError as e:
-        if e.args[0] == 2:
-            try: os.mkdir(dir_path); log_event("SYSTEM", f"Created directory: {dir_path}")
-            except OSError as mkdir_e: print(f"!!! CRITICAL: Failed to create directory {dir_path}: {mkdir_e}"); raise mkdir_e
-        else: print(f"!!! ERROR: Could not access directory {dir_path}: {e}"); raise e
+        if e.args[0] != 17: print(f"!!! CRITICAL: Failed to create directory {dir_path}: {e}"); raise e
 
 def log_event(category, message):
-    global event_log_file_handle
+    global _log_buf
+    try:
+        category = category.upper()
+        now = get_now()
+        timestamp = f"{now[0]}-{now[1]:02d}-{now[2]:02d} {now[4]:02d}:{now[5]:02d}:{now[6]:02d}"
+        _log_buf += f"{timestamp} [{category}] {message}\n".encode()
+        # Only errors hit flash inline; a full buffer is handed to log_task so callers (BLE IRQ,
+        # schedule transitions) never block on a filesystem write
+        if category in _LOG_FLUSH_CATEGORIES: flush_event_log()
+        elif len(_log_buf) >= config.LOG_FLUSH_BYTES: log_event_flag.set()
+    except Exception as e: print(f"!!! EVENT LOGGING FAILED: {e}")
+
+def flush_event_log():
+    global event_log_file_handle, _log_buf
+    if not _log_buf: return
+    # Swap the buffer out before writing: lines appended meanwhile (e.g. from the BLE IRQ) land in the new one
+    buf, _log_buf = _log_buf, bytearray()
     try:
         if event_log_file_handle is None:
             ensure_directory(config.LOGS_DIRECTORY)
-            event_log_file_handle = open(config.LOG_EVENT_FILE, "a")
-        now = rtc.datetime()
-        timestamp = f"{now[0]}-{now[1]:02d}-{now[2]:02d} {now[4]:02d}:{now[5]:02d}:{now[6]:02d}"
-        log_line = f"{timestamp} [{category.upper()}] {message}\n"
-        event_log_file_handle.write(log_line); event_log_file_handle.flush()
+            event_log_file_handle = open(config.LOG_EVENT_FILE, "ab")
+        event_log_file_handle.write(buf); event_log_file_handle.flush()
     except Exception as e:
         print(f"!!! EVENT LOGGING FAILED: {e}")
         if event_log_file_handle:
@@ -61,82 +132,153 @@ def log_event(category, message):
             except Exception: pass
             event_log_file_handle = None
 
+def open_csv_log():
+    """Opens the CSV log once (kept open like the event log), writing the header only for a new file."""
+    global csv_log_file_handle
+    # The event log is only buffered at boot, so /logs may not exist yet when the first row is written
+    ensure_directory(config.LOGS_DIRECTORY)
+    csv_log_file_handle = open(config.SENSOR_LIGHT_LOG_PATH, "a")
+    # littlefs leaves an append-mode file at position 0 until the first write; seek to the end
+    # so that position 0 really means a new (or empty) log
+    csv_log_file_handle.seek(0, 2)
+    if csv_log_file_handle.tell() == 0: csv_log_file_handle.write("timestamp,temperature_c,humidity_rh,co2_ppm,pressure_hpa,lux,light_recipe\n")
+
 def log_sensor_data_csv():
+    global csv_log_file_handle
     try:
-        full_path = f"{config.LOGS_DIRECTORY}/{config.SENSOR_LIGHT_LOG_FILE}"
-        file_exists = False
-        try: os.stat(full_path); file_exists = True
-        except OSError: file_exists = False
-        with open(full_path, "a") as f:
-            if not file_exists: f.write("timestamp,temperature_c,humidity_rh,co2_ppm,pressure_hpa,lux,light_recipe\n")
-            now = rtc.datetime()
-            timestamp = f"{now[0]}-{now[1]:02d}-{now[2]:02d}T{now[4]:02d}:{now[5]:02d}:{now[6]:02d}"
-            temp = f"{last_temp_c:.2f}" if last_temp_c is not None else ""
-            hum = f"{last_humidity:.2f}" if last_humidity is not None else ""
-            co2 = f"{last_co2}" if last_co2 is not None else ""
-            press = f"{last_pressure:.2f}" if last_pressure is not None else ""
-            lux = f"{last_lux:.2f}" if last_lux is not None else ""
-            recipe = light_controller.get_current_recipe_name() if light_controller else "unknown"
-            f.write(f"{timestamp},{temp},{hum},{co2},{press},{lux},{recipe}\n")
-    except Exception as e: log_event("ERROR", f"Failed to write to CSV log: {e}")
+        if csv_log_file_handle is None: open_csv_log()
+        now = get_now()
+        timestamp = f"{now[0]}-{now[1]:02d}-{now[2]:02d}T{now[4]:02d}:{now[5]:02d}:{now[6]:02d}"
+        temp = f"{last_temp_c:.2f}" if last_temp_c is not None else ""
+        hum = f"{last_humidity:.2f}" if last_humidity is not None else ""
+        co2 = f"{last_co2}" if last_co2 is not None else ""
+        press = f"{last_pressure:.2f}" if last_pressure is not None else ""
+        lux = f"{last_lux:.2f}" if last_lux is not None else ""
+        recipe = light_controller.get_current_recipe_name() if light_controller else "unknown"
+        csv_log_file_handle.write(f"{timestamp},{temp},{hum},{co2},{press},{lux},{recipe}\n"); csv_log_file_handle.flush()
+    except Exception as e:
+        log_event("ERROR", f"Failed to write to CSV log: {e}")
+        if csv_log_file_handle:
+            try: csv_log_file_handle.close()
+            except Exception: pass
+            csv_log_file_handle = None
 
 # ---------------------------------------------------------------------------
 # Advanced Schedule Functions
 # ---------------------------------------------------------------------------
-def save_schedule_to_storage(schedule_data):
+def pack_schedule(schedule_data):
+    """Packs a legacy dict schedule into the in-RAM/storage image."""
+    blocks = schedule_data.get("blocks", [])
+    buf = bytearray(_SCHED_HDR_SIZE + len(blocks) * _SCHED_REC_SIZE)
+    struct.pack_into(config.SCHEDULE_HDR_FMT, buf, 0, schedule_data.get("version", 1),
+                     1 if schedule_data.get("enabled", True) else 0, len(blocks))
+    offset = _SCHED_HDR_SIZE
+    for block in blocks:
+        struct.pack_into(config.SCHEDULE_REC_FMT, buf, offset, block["start"], block["end"],
+                         config.recipe_to_code(block["recipe"]) or 0, 1 if block.get("enabled", True) else 0)
+        offset += _SCHED_REC_SIZE
+    return buf
+
+def schedule_block(data, i):
+    """Returns (start_min, end_min, recipe_code, enabled) for block i of a schedule image."""
+    return struct.unpack_from(config.SCHEDULE_REC_FMT, data, _SCHED_HDR_SIZE + i * _SCHED_REC_SIZE)
+
+def save_schedule_to_storage(data):
     try:
-        with open(config.SCHEDULE_STORAGE_FILE, "w") as f: json.dump(schedule_data, f)
-        log_event("SCHEDULE", f"Schedule saved with {len(schedule_data.get('blocks', []))} blocks.")
+        with open(config.SCHEDULE_STORAGE_FILE, "wb") as f: f.write(data)
+        log_event("SCHEDULE", f"Schedule saved with {data[2]} blocks.")
         return True
     except Exception as e: log_event("ERROR", f"Failed to save schedule: {e}"); return False
 
+def load_legacy_json_schedule():
+    import json
+    with open(config.SCHEDULE_LEGACY_JSON_FILE, "r") as f: loaded_schedule = json.load(f)
+    log_event("SCHEDULE", "Migrating legacy JSON schedule to binary storage.")
+    if not validate_legacy_schedule(loaded_schedule): return None
+    data = pack_schedule(loaded_schedule); save_schedule_to_storage(data)
+    return data
+
 def load_schedule_from_storage():
     global current_schedule
     try:
-        with open(config.SCHEDULE_STORAGE_FILE, "r") as f: loaded_schedule = json.load(f)
-        if validate_schedule_data(loaded_schedule):
-            current_schedule = loaded_schedule
-            log_event("SCHEDULE", f"Schedule loaded with {len(current_schedule.get('blocks', []))} blocks.")
+        try:
+            with open(config.SCHEDULE_STORAGE_FILE, "rb") as f: loaded_schedule = f.read()
+        except OSError: loaded_schedule = load_legacy_json_schedule()
+        if loaded_schedule and validate_schedule_data(loaded_schedule):
+            current_schedule = bytearray(loaded_schedule)
+            log_event("SCHEDULE", f"Schedule loaded with {current_schedule[2]} blocks.")
         else: log_event("WARN", "Invalid schedule data in storage. Using defaults.")
     except OSError: log_event("SCHEDULE", "No schedule file found. Using defaults.")
     except Exception as e: log_event("ERROR", f"Unexpected error loading schedule: {e}")
 
-def validate_schedule_data(data):
+def validate_legacy_schedule(data):
     if not isinstance(data, dict) or "blocks" not in data or not isinstance(data["blocks"], list): return False
     if len(data["blocks"]) > config.MAX_SCHEDULE_BLOCKS: return False
     for block in data["blocks"]:
         if not all(key in block for key in ["start", "end", "recipe", "enabled"]): return False
         if not (0 <= block["start"] <= 1439 and 0 <= block["end"] <= 1439): return False
-        if block["recipe"] not in config.LIGHT_RECIPES: return False
+        if block["recipe"] not in config.RECIPE_NAMES: return False
+    return True
+
+def validate_schedule_data(data):
+    if len(data) < _SCHED_HDR_SIZE: return False
+    num_blocks = data[2]
+    if num_blocks > config.MAX_SCHEDULE_BLOCKS: return False
+    if len(data) < _SCHED_HDR_SIZE + num_blocks * _SCHED_REC_SIZE: return False
+    for i in range(num_blocks):
+        start_min, end_min, recipe_code, _ = schedule_block(data, i)
+        if start_min > 1439 or end_min > 1439 or recipe_code >= _RECIPE_COUNT: return False
     return True
 
 def get_current_schedule_block():
-    if not current_schedule.get("enabled", False): return None
-    now = rtc.datetime()
+    """Returns the index of the active block in current_schedule, or None."""
+    data = current_schedule
+    if not data[1]: return None
+    now = get_now()
     current_minutes = now[4] * 60 + now[5]
-    for block in reversed(current_schedule.get("blocks", [])):
-        if not block.get("enabled", True): continue
-        start_min, end_min = block["start"], block["end"]
+    hdr, rec = _SCHED_HDR_SIZE, _SCHED_REC_SIZE
+    # Later blocks take priority; records are little-endian <HHBB, so read the fields as plain bytes
+    for o in range(hdr + (data[2] - 1) * rec, hdr - 1, -rec):
+        if not data[o + 5]: continue
+        start_min, end_min = data[o] | data[o + 1] << 8, data[o + 2] | data[o + 3] << 8
         if start_min <= end_min:
-            if start_min <= current_minutes < end_min: return block
+            if start_min <= current_minutes < end_min: return (o - hdr) // rec
         else:
-            if current_minutes >= start_min or current_minutes < end_min: return block
+            if current_minutes >= start_min or current_minutes < end_min: return (o - hdr) // rec
     return None
 
+def ms_until_next_schedule_change():
+    """Returns ms until the next enabled block starts or ends, or None if there is none."""
+    data = current_schedule
+    if not data[1]: return None
+    now = get_now()
+    current_minutes = now[4] * 60 + now[5]
+    hdr, rec = _SCHED_HDR_SIZE, _SCHED_REC_SIZE
+    best = None
+    for o in range(hdr, hdr + data[2] * rec, rec):
+        if not data[o + 5]: continue
+        for boundary in (data[o] | data[o + 1] << 8, data[o + 2] | data[o + 3] << 8):
+            ahead = (boundary - current_minutes - 1) % 1440 + 1  # 1..1440 minutes, wrapping at midnight
+            if best is None or ahead < best: best = ahead
+    return None if best is None else best * 60000 - now[6] * 1000
+
 def apply_schedule_block(block):
-    if schedule_override_until_ms > time.ticks_ms(): return
-    recipe_name = block.get("recipe", "off") if block else "off"
-    if light_controller and light_controller.get_current_recipe_name() != recipe_name:
-        log_event("SCHEDULE", f"Applying recipe: '{recipe_name}'")
-        fade = getattr(config, 'SCHEDULE_TRANSITION_FADE_SEC', config.FADE_DURATION)
-        light_controller.set_recipe_by_name(recipe_name, fade)
+    global schedule_override_until_ms
+    if schedule_override_until_ms is not None:
+        # ticks wrap (~12 days on the RP2040), so compare with ticks_diff and drop the deadline once it passes
+        if time.ticks_diff(schedule_override_until_ms, time.ticks_ms()) > 0: return
+        schedule_override_until_ms = None
+    # Compare and apply by recipe code: the record already holds it, so no name round-trip or string compare
+    recipe_code = schedule_block(current_schedule, block)[2] if block is not None else _OFF_CODE
+    if light_controller and light_controller.current_recipe_code != recipe_code:
+        log_event("SCHEDULE", f"Applying recipe: '{config.code_to_recipe(recipe_code)}'")
+        light_controller.set_recipe_by_code(recipe_code, _SCHEDULE_FADE_MS)
 
 def set_manual_override():
     global schedule_override_until_ms
-    if getattr(config, 'SCHEDULE_RESUME_AFTER_MANUAL', True):
-        delay_sec = getattr(config, 'SCHEDULE_RESUME_DELAY_SEC', 300)
-        schedule_override_until_ms = time.ticks_add(time.ticks_ms(), delay_sec * 1000)
-        log_event("SCHEDULE", f"Manual override set. Schedule paused for {delay_sec}s.")
+    if _RESUME_AFTER_MANUAL:
+        schedule_override_until_ms = time.ticks_add(time.ticks_ms(), _RESUME_DELAY_MS)
+        log_event("SCHEDULE", f"Manual override set. Schedule paused for {_RESUME_DELAY_MS // 1000}s.")
 
 def process_schedule_command(payload):
     global current_schedule
@@ -144,20 +286,25 @@ def process_schedule_command(payload):
         if len(payload) < 2: return False
         version, num_blocks = payload[0], payload[1]
         if num_blocks <= config.MAX_SCHEDULE_BLOCKS and len(payload) >= (2 + num_blocks * 6):
-            blocks = []
-            for i in range(num_blocks):
-                offset = 2 + (i * 6)
-                start_h, start_m, end_h, end_m, recipe_code, enabled = struct.unpack_from('!BBBBBB', payload, offset)
-                recipe_name = config.CODE_TO_RECIPE.get(recipe_code, 'off')
-                blocks.append({
-                    "start": start_h * 60 + start_m, "end": end_h * 60 + end_m,
-                    "recipe": recipe_name, "enabled": bool(enabled)
-                })
-            new_schedule = {"version": version, "enabled": True, "blocks": blocks}
-            if save_schedule_to_storage(new_schedule):
-                current_schedule = new_schedule
-                log_event("SCHEDULE", f"Saved new schedule via BLE with {len(blocks)} blocks.")
-                check_and_apply_schedule(force=True)
+            data = bytearray(_SCHED_HDR_SIZE + num_blocks * _SCHED_REC_SIZE)
+            struct.pack_into(config.SCHEDULE_HDR_FMT, data, 0, version, 1, num_blocks)
+            offset = _SCHED_HDR_SIZE
+            # Every field of _FMT_SCHED_BLOCK is a single unsigned byte, so the payload
+            # is already "unpacked": index it directly instead of one struct call per block.
+            for src in range(2, 2 + num_blocks * 6, 6):
+                recipe_code = payload[src + 4]
+                struct.pack_into(config.SCHEDULE_REC_FMT, data, offset,
+                                 payload[src] * 60 + payload[src + 1], payload[src + 2] * 60 + payload[src + 3],
+                                 recipe_code if recipe_code < _RECIPE_COUNT else 0, 1 if payload[src + 5] else 0)
+                offset += _SCHED_REC_SIZE
+            if data == current_schedule:
+                # Re-sent unchanged (e.g. a repeated Save); don't rewrite flash
+                log_event("SCHEDULE", "Received schedule matches the stored one; not rewriting.")
+                return True
+            if validate_schedule_data(data) and save_schedule_to_storage(data):
+                current_schedule = data
+                log_event("SCHEDULE", f"Saved new schedule via BLE with {num_blocks} blocks.")
+                check_and_apply_schedule(force=True); schedule_event.set()
                 return True
     except Exception as e: log_event("ERROR", f"Failed processing schedule command: {e}"); return False
 
@@ -166,201 +313,387 @@ def process_schedule_command(payload):
 # ---------------------------------------------------------------------------
 class LightController:
     def __init__(self, pin, num_pixels):
-        # Initialize NeoPixel library in 4-channel (RGBW) mode
-        self.np = neopixel.NeoPixel(machine.Pin(pin), num_pixels, bpp=4)
+        # Initialize the NeoPixel output in 4-channel (RGBW) mode; PIO+DMA keeps IRQs enabled during writes
+        self.np = None
+        if config.NEOPIXEL_USE_PIO_DMA:
+            try:
+                from pio_neopixel import PioNeoPixel
+                self.np = PioNeoPixel(pin, num_pixels, config.NEOPIXEL_PIO_SM)
+            except Exception as e: print(f"WARN: PIO NeoPixel driver unavailable ({e}); using neopixel.")
+        if self.np is None: self.np = neopixel.NeoPixel(machine.Pin(pin), num_pixels, bpp=4)
+        self._buf_mv = memoryview(self.np.buf)
+        self._frames = {}  # recipe code -> full pre-packed NeoPixel frame (built on first use)
+        # 'off' is all zeros in any wire order; seed it so shutdown cleanup never has to build a frame
+        self._frames[_OFF_CODE] = bytes(len(self.np.buf))
+        self._ramps = {}   # (from_code << 8) | to_code -> fade ramp between two recipes (built on first use)
         self.current_recipe_name = 'off'
+        self.current_recipe_code = _OFF_CODE  # Requested recipe; None while a custom colour is shown
+        self.current_rgbw = (0, 0, 0, 0)      # Colour actually on the strip
+        self._shown_code = _OFF_CODE          # Recipe actually on the strip (None mid-fade or custom)
+        self._fading = False
+        # Latest request as a (recipe_code, rgbw, duration_ms) tuple. BLE handlers run in the IRQ callback,
+        # so they only swap this reference and set light_event; run() does every strip write on the event loop.
+        self._request = self._applied = None
         
-    def set_recipe_by_name(self, recipe_name, duration_sec=None):
-        if recipe_name in config.LIGHT_RECIPES:
-            # *** FIX: REMOVED incorrect color re-ordering ***
-            # The library expects (R,G,B,W) when bpp=4, which matches our config.
-            color_tuple = config.LIGHT_RECIPES[recipe_name]
-            self.np.fill(color_tuple)
-            self.np.write()
-            self.current_recipe_name = recipe_name
+    def set_recipe_by_name(self, recipe_name, duration_ms=None):
+        recipe_code = config.recipe_to_code(recipe_name)
+        if recipe_code is not None:
+            self.set_recipe_by_code(recipe_code, duration_ms)
             return True
         return False
+
+    def set_recipe_by_code(self, recipe_code, duration_ms=None):
+        # *** FIX: REMOVED incorrect color re-ordering ***
+        # The library expects (R,G,B,W) when bpp=4, which matches our config.
+        self._request = (recipe_code, config.recipe_rgbw(recipe_code), duration_ms); light_event.set()
+        self.current_recipe_name = config.RECIPE_NAMES[recipe_code]
+        self.current_recipe_code = recipe_code
+
+    def show(self, color_tuple):
+        self._request = (None, color_tuple, 0); light_event.set()
+
+    async def run(self):
+        """Applies the latest requested recipe/colour; the only place the strip is written while running."""
+        while True:
+            await light_event.wait()
+            req = self._request
+            while req is not self._applied:
+                self._applied = req
+                recipe_code, color_tuple, duration_ms = req
+                if duration_ms and _FADE_TOTAL_STEPS > 0:
+                    ramp = self._recipe_ramp(recipe_code, color_tuple) if recipe_code is not None else None
+                    self._shown_code = None
+                    if await self.fade_to(color_tuple, duration_ms // _FADE_TOTAL_STEPS, ramp): self._shown_code = recipe_code
+                elif recipe_code is not None: self.show_recipe_frame(recipe_code, color_tuple)
+                else: self._show(color_tuple)
+                req = self._request
+
+    def _recipe_ramp(self, recipe_code, color_tuple):
+        # Only recipe-to-recipe fades have a known start colour worth caching
+        from_code = self._shown_code
+        if from_code is None or not config.FADE_RAMP_CACHE_SIZE: return None
+        key = (from_code << 8) | recipe_code
+        ramp = self._ramps.get(key)
+        if ramp is None:
+            if len(self._ramps) >= config.FADE_RAMP_CACHE_SIZE: self._ramps.clear()
+            ramp = self._ramps[key] = config.make_fade_ramp(self.current_rgbw, color_tuple)
+        return ramp
+
+    def _fill_buf(self, color, o=0):
+        # Writes the first pixel (color[o:o + 4]) in the driver's wire order, then doubles it across
+        # the buffer with memoryview slice copies (C memcpy) instead of fill()'s Python loop.
+        buf, mv, order = self.np.buf, self._buf_mv, self.np.ORDER
+        for i in range(4): buf[order[i]] = color[o + i]
+        n, total = 4, len(buf)
+        while n < total:
+            k = min(n, total - n); mv[n:n + k] = mv[0:k]; n += k
+
+    def show_recipe_frame(self, recipe_code, color_tuple):
+        frame = self._frames.get(recipe_code)
+        if frame is None:
+            self._fill_buf(color_tuple); frame = self._frames[recipe_code] = bytes(self.np.buf)
+        else: self._buf_mv[:] = frame
+        self.np.write()
+        self.current_rgbw = color_tuple; self._shown_code = recipe_code
+
+    def _show(self, color_tuple):
+        self._fill_buf(color_tuple)
+        self.np.write()
+        self.current_rgbw = color_tuple; self._shown_code = None
+
+    def blackout(self):
+        """Writes the 'off' frame immediately; for shutdown, once run() is no longer running."""
+        self.show_recipe_frame(_OFF_CODE, config.recipe_rgbw(_OFF_CODE))
+
+    async def fade_to(self, color_tuple, step_ms=config.FADE_STEP_MS, ramp=None):
+        """Fades to color_tuple; returns False if a newer request superseded it part-way."""
+        if ramp is None: ramp = config.make_fade_ramp(self.current_rgbw, color_tuple)
+        # Per-step callables bound to locals once: each step is then a local load, not a module/attr lookup
+        ticks_ms, ticks_add, ticks_diff, sleep_ms = time.ticks_ms, time.ticks_add, time.ticks_diff, asyncio.sleep_ms
+        fill_buf, write = self._fill_buf, self.np.write
+        self._fading = True
+        # Sleep to absolute per-step deadlines so write time doesn't stretch the fade
+        deadline = ticks_ms()
+        for i in range(0, len(ramp), 4):
+            if self._request is not self._applied:
+                # Superseded: keep the colour last written so the next fade starts from what is on the strip
+                if i: self.current_rgbw = (ramp[i - 4], ramp[i - 3], ramp[i - 2], ramp[i - 1])
+                self._fading = False
+                return False
+            # Small or slow fades repeat colours between steps; only push frames that changed
+            if not (i and ramp[i] == ramp[i - 4] and ramp[i + 1] == ramp[i - 3] and
+                    ramp[i + 2] == ramp[i - 2] and ramp[i + 3] == ramp[i - 1]):
+                fill_buf(ramp, i); write()
+            deadline = ticks_add(deadline, step_ms)
+            delay = ticks_diff(deadline, ticks_ms())
+            if delay > 0: await sleep_ms(delay)
+        self.current_rgbw = color_tuple; self._fading = False
+        return True
         
     def get_current_recipe_name(self): return self.current_recipe_name
 
+    def is_dark(self): return not self._fading and self._request is self._applied and not any(self.current_rgbw)
+
 class BluetoothController:
     def __init__(self, light_ctrl):
         self.lights = light_ctrl
         self.ble = bluetooth.BLE(); self.ble.active(True); self.ble.irq(self._irq_handler)
-        self.connected = False; self.conn_handle = None
+        self.ble.config(mtu=config.BT_MTU)
+        self.connected = False; self.conn_handle = None; self.mtu = 23
+        self.adv_interval_us = None; self.adv_started_ms = 0
+        self._sensor_buf = bytearray(struct.calcsize(config.SENSOR_PACK_FMT)); self._last_notified = None
+        # Shared scratch for control notifications: sized for the largest one, the status bundle
+        # (code + memory + time + schedule records), so notifies never allocate a payload
+        self._notify_buf = bytearray(1 + 5 + 9 + 3 + config.MAX_SCHEDULE_BLOCKS * 6)
+        self._notify_mv = memoryview(self._notify_buf)
+        # Name and connection hints never change, so the advertising payload is built once and reused
+        self._adv_name = config.get_bt_device_name(); name = self._adv_name.encode()
+        self._adv_payload = (b'\x02\x01\x06' + bytes((len(name) + 1, 0x09)) + name +
+                             struct.pack("<BBHH", 5, 0x12, config.BT_PREFERRED_CONN_INTERVAL_MIN, config.BT_PREFERRED_CONN_INTERVAL_MAX))
+        self._register_services(); log_event("BLE", "Services registered successfully.")
+        self._start_advertising()
+
+    def suspend(self):
+        """Powers BLE down (around machine.lightsleep); resume() brings it back and re-advertises."""
+        self.ble.active(False); self.connected = False; self.conn_handle = None
+
+    def resume(self):
+        self.ble.active(True); self.ble.irq(self._irq_handler)
+        self.ble.config(mtu=config.BT_MTU)
+        # Deactivating the stack drops the GATT database, so services (and handles) are registered again
         self._register_services(); self._start_advertising()
+        # Advertising restarts fast; wake ble_task so it re-arms the fast-window timeout and drops back to slow
+        ble_event.set()
 
     def _register_services(self):
-        svc_uuid = bluetooth.UUID(config.BLE_SERVICE_UUID)
-        recipe_char = (bluetooth.UUID(config.BLE_RECIPE_CHAR_UUID), bluetooth.FLAG_WRITE)
-        custom_char = (bluetooth.UUID(config.BLE_CUSTOM_CHAR_UUID), bluetooth.FLAG_WRITE)
-        ctrl_char = (bluetooth.UUID(config.BLE_CONTROL_CHAR_UUID), bluetooth.FLAG_WRITE | bluetooth.FLAG_NOTIFY)
-        sched_char = (bluetooth.UUID(config.BLE_SCHEDULE_CHAR_UUID), bluetooth.FLAG_WRITE)
-        sensor_char = (bluetooth.UUID(config.BLE_COMBINED_SENSOR_CHAR_UUID), bluetooth.FLAG_READ | bluetooth.FLAG_NOTIFY)
+        svc_uuid = config.BLE_SERVICE_UUID
+        recipe_char = (config.BLE_RECIPE_CHAR_UUID, bluetooth.FLAG_WRITE)
+        # Write-without-response lets clients stream colour/command writes without an ATT round trip each
+        custom_char = (config.BLE_CUSTOM_CHAR_UUID, bluetooth.FLAG_WRITE | bluetooth.FLAG_WRITE_NO_RESPONSE)
+        ctrl_char = (config.BLE_CONTROL_CHAR_UUID, bluetooth.FLAG_WRITE | bluetooth.FLAG_WRITE_NO_RESPONSE | bluetooth.FLAG_NOTIFY)
+        sched_char = (config.BLE_SCHEDULE_CHAR_UUID, bluetooth.FLAG_WRITE)
+        sensor_char = (config.BLE_COMBINED_SENSOR_CHAR_UUID, bluetooth.FLAG_READ | bluetooth.FLAG_NOTIFY)
         
         service_definition = (svc_uuid, (recipe_char, custom_char, ctrl_char, sched_char, sensor_char))
         handles = self.ble.gatts_register_services((service_definition,))
         
         (self.recipe_handle, self.custom_handle, self.control_handle, 
          self.schedule_handle, self.sensor_handle) = handles[0]
-        log_event("BLE", "Services registered successfully.")
+        self._write_handlers = {self.control_handle: self._handle_control_write, self.schedule_handle: self._handle_schedule_write,
+                                self.recipe_handle: self._handle_recipe_write, self.custom_handle: self._handle_custom_write}
+        # Schedule writes carry up to MAX_SCHEDULE_BLOCKS records; the default 20-byte value buffer would truncate them
+        self.ble.gatts_set_buffer(self.schedule_handle, 2 + config.MAX_SCHEDULE_BLOCKS * 6)
+        self._commands = {0: self._cmd_off, 1: self._cmd_on, 12: self._cmd_request_settings, 30: self._cmd_set_rtc_time}
 
-    def _start_advertising(self):
+    def _start_advertising(self, interval_us=config.BT_ADV_INTERVAL_FAST_US):
         global ble_needs_restart
         try:
-            name = config.BT_DEVICE_NAME.encode()
-            adv_payload = b'\x02\x01\x06' + bytes([len(name) + 1, 0x09]) + name
-            self.ble.gap_advertise(config.BT_ADV_INTERVAL_US, adv_data=adv_payload)
-            print(f"INFO: Advertising as '{config.BT_DEVICE_NAME}'..."); ble_needs_restart = False
+            if config.GC_FORCE_BEFORE_ADV:
+                gc.collect(); gc.threshold(gc.mem_free() // 4 + gc.mem_alloc())
+            self.ble.gap_advertise(interval_us, adv_data=self._adv_payload)
+            self.adv_interval_us = interval_us; self.adv_started_ms = time.ticks_ms()
+            print(f"INFO: Advertising as '{self._adv_name}' every {interval_us // 1000} ms..."); ble_needs_restart = False
         except Exception as e: log_event("ERROR", f"BLE advertising failed: {e}"); ble_needs_restart = True
 
+    def check_advertising_interval(self):
+        """Drops from the fast to the slow advertising interval once the fast window expires.
+        Returns the ms left until that is due, or None if nothing is pending."""
+        if self.connected or self.adv_interval_us != config.BT_ADV_INTERVAL_FAST_US: return None
+        remaining = config.BT_ADV_FAST_WINDOW_MS - time.ticks_diff(time.ticks_ms(), self.adv_started_ms)
+        if remaining > 0: return remaining
+        self._start_advertising(config.BT_ADV_INTERVAL_SLOW_US)
+
     def _irq_handler(self, event, data):
         global ble_needs_restart
-        _IRQ_CENTRAL_CONNECT, _IRQ_CENTRAL_DISCONNECT, _IRQ_GATTS_WRITE = 1, 2, 3
+        _IRQ_CENTRAL_CONNECT, _IRQ_CENTRAL_DISCONNECT, _IRQ_GATTS_WRITE, _IRQ_MTU_EXCHANGED, _IRQ_CONNECTION_UPDATE = 1, 2, 3, 21, 27
         if event == _IRQ_CENTRAL_CONNECT:
-            self.conn_handle, _, _ = data; self.connected = True
+            self.conn_handle, _, _ = data; self.connected = True; self.mtu = 23; self._last_notified = None
             log_event("BLE", f"Connected (handle: {self.conn_handle})")
+            # Most centrals start the exchange themselves; ask anyway so the bundle isn't split on those that don't
+            try: self.ble.gattc_exchange_mtu(self.conn_handle)
+            except Exception as e: log_event("BLE", f"MTU exchange not started: {e}")
         elif event == _IRQ_CENTRAL_DISCONNECT:
             self.conn_handle, self.connected = None, False
-            log_event("BLE", "Disconnected"); ble_needs_restart = True
+            log_event("BLE", "Disconnected"); ble_needs_restart = True; ble_event.set()
         elif event == _IRQ_GATTS_WRITE:
             _, value_handle = data
-            if value_handle == self.control_handle: self._handle_control_write()
-            elif value_handle == self.schedule_handle: self._handle_schedule_write()
-            elif value_handle == self.recipe_handle: self._handle_recipe_write()
-            elif value_handle == self.custom_handle: self._handle_custom_write()
+            handler = self._write_handlers.get(value_handle)
+            # Read the written value once here; handlers parse the bytes in place
+            if handler: handler(self.ble.gatts_read(value_handle))
+        elif event == _IRQ_MTU_EXCHANGED:
+            _, self.mtu = data
+            log_event("BLE", f"MTU exchanged: {self.mtu}")
+        elif event == _IRQ_CONNECTION_UPDATE:
+            _, conn_interval, conn_latency, supervision_timeout, status = data
+            log_event("BLE", f"Connection params: interval={conn_interval * 5 // 4}ms latency={conn_latency} timeout={supervision_timeout * 10}ms status={status}")
 
-    def _handle_recipe_write(self):
+    def _handle_recipe_write(self, data):
         try:
-            data = self.ble.gatts_read(self.recipe_handle)
-            if data and len(data) > 0:
+            if data:
                 recipe_idx = data[0]
-                recipe_name = config.CODE_TO_RECIPE.get(recipe_idx, 'off')
-                log_event("BLE", f"Received recipe command: idx={recipe_idx}, name='{recipe_name}'")
+                recipe_name = config.code_to_recipe(recipe_idx)
+                if _DEBUG: log_event("BLE", f"Received recipe command: idx={recipe_idx}, name='{recipe_name}'")
                 set_manual_override()
                 self.lights.set_recipe_by_name(recipe_name)
         except Exception as e: log_event("ERROR", f"Handling recipe write: {e}")
 
-    def _handle_custom_write(self):
+    def _handle_custom_write(self, data):
         try:
-            data = self.ble.gatts_read(self.custom_handle)
             if data and len(data) == 4:
-                r, g, b, w = struct.unpack('!BBBB', data)
-                log_event("BLE", f"Received custom color: R={r} G={g} B={b} W={w}")
+                r, g, b, w = data  # One unsigned byte per channel; no struct call needed
+                if _DEBUG: log_event("BLE", f"Received custom color: R={r} G={g} B={b} W={w}")
                 set_manual_override()
                 # *** FIX: REMOVED incorrect color re-ordering ***
-                self.lights.np.fill((r, g, b, w))
-                self.lights.np.write()
-                self.lights.current_recipe_name = 'custom'
+                self.lights.show((r, g, b, w))
+                self.lights.current_recipe_name = 'custom'; self.lights.current_recipe_code = None
         except Exception as e: log_event("ERROR", f"Handling custom write: {e}")
             
-    def _handle_control_write(self):
+    def _handle_control_write(self, data):
         try:
-            data = self.ble.gatts_read(self.control_handle)
             if not data: return
-            cmd_code, payload = data[0], data[1:]
-            log_event("BLE", f"Received control command: code={cmd_code}")
-
-            if cmd_code == 0:
-                set_manual_override(); self.lights.set_recipe_by_name('off')
-            elif cmd_code == 1:
-                set_manual_override(); self.lights.set_recipe_by_name(config.ACTIVE_RECIPE)
-            elif cmd_code == 12: # CMD_REQUEST_SETTINGS
-                log_event("BLE", "Status requested. Sending all status notifications.")
-                force_sensor_read_and_update_cache()
-                self.notify_sensor_data()
-                self.notify_memory_update()
-                self.notify_time_update()
-                self.notify_schedule_data()
-            elif cmd_code == 30: # CMD_SET_RTC_TIME
-                if len(payload) >= 8:
-                    yr, mo, d, h, mi, s, wd_js = struct.unpack("<HBBBBBB", payload)
-                    pico_weekday = wd_js if wd_js > 0 else 7
-                    rtc.datetime((yr, mo, d, pico_weekday, h, mi, s, 0))
-                    log_event("SYSTEM", f"RTC time set via BLE to: {yr}-{mo}-{d} {h}:{mi}:{s}")
-                    self.notify_time_update()
+            cmd_code = data[0]
+            if _DEBUG: log_event("BLE", f"Received control command: code={cmd_code}")
+            command = self._commands.get(cmd_code)
+            if command: command(data)
         except Exception as e:
             log_event("ERROR", f"Handling control write: {e}")
-            s = io.StringIO(); sys.print_exception(e, s); log_event("ERROR-TRACE", s.getvalue())
+            log_event("ERROR-TRACE", format_traceback(e))
             
-    def _handle_schedule_write(self):
+    def _cmd_off(self, data):
+        set_manual_override(); self.lights.set_recipe_by_name('off')
+
+    def _cmd_on(self, data):
+        set_manual_override(); self.lights.set_recipe_by_name(_ACTIVE_RECIPE)
+
+    def _cmd_request_settings(self, data):
+        if _DEBUG: log_event("BLE", "Status requested. Sending all status notifications.")
+        force_sensor_read_and_update_cache()
+        self.notify_sensor_data(force=True)
+        self.notify_status_bundle()
+
+    def _cmd_set_rtc_time(self, data):
+        if len(data) >= 9:
+            yr, mo, d, h, mi, s, wd_js = struct.unpack_from(_FMT_RTC_SET, data, 1)
+            pico_weekday = wd_js if wd_js > 0 else 7
+            rtc.datetime((yr, mo, d, pico_weekday, h, mi, s, 0)); invalidate_now(); schedule_event.set()
+            log_event("SYSTEM", f"RTC time set via BLE to: {yr}-{mo}-{d} {h}:{mi}:{s}")
+            self.notify_time_update()
+
+    def _handle_schedule_write(self, payload):
         try:
-            payload = self.ble.gatts_read(self.schedule_handle)
             if payload:
-                log_event("BLE", f"Received {len(payload)} bytes on schedule characteristic.")
+                if _DEBUG: log_event("BLE", f"Received {len(payload)} bytes on schedule characteristic.")
                 process_schedule_command(payload)
         except Exception as e: log_event("ERROR", f"Handling schedule write: {e}")
 
-    def notify_sensor_data(self):
+    def notify_sensor_data(self, force=False):
+        """Notifies the latest readings; skipped when nothing changed since the last notify unless forced."""
         if not self.connected: return
+        values = (last_temp_c, last_humidity, last_co2, last_pressure, last_lux)
+        if not force and values == self._last_notified: return
         try:
-            payload_str = f"{last_temp_c:.1f}" if last_temp_c is not None else "N/A"
-            payload_str += f",{last_humidity:.1f}" if last_humidity is not None else ",N/A"
-            payload_str += f",{last_co2}" if last_co2 is not None else ",N/A"
-            payload_str += f",{last_pressure:.1f}" if last_pressure is not None else ",N/A"
-            payload_str += f",{last_lux:.1f}" if last_lux is not None else ",N/A"
-            self.ble.gatts_write(self.sensor_handle, payload_str.encode())
+            struct.pack_into(config.SENSOR_PACK_FMT, self._sensor_buf, 0,
+                             _NAN if last_temp_c is None else last_temp_c,
+                             _NAN if last_humidity is None else last_humidity,
+                             _NAN if last_co2 is None else last_co2,
+                             _NAN if last_pressure is None else last_pressure,
+                             _NAN if last_lux is None else last_lux)
+            self.ble.gatts_write(self.sensor_handle, self._sensor_buf)
             self.ble.gatts_notify(self.conn_handle, self.sensor_handle)
+            self._last_notified = values
         except Exception as e: log_event("ERROR", f"Failed to notify sensor data: {e}")
 
+    def _notify_control(self, end):
+        self.ble.gatts_write(self.control_handle, self._notify_mv[:end])
+        self.ble.gatts_notify(self.conn_handle, self.control_handle)
+
+    # The _pack_* helpers write one control record into _notify_buf at offset and return its end
+    def _pack_memory(self, offset):
+        struct.pack_into(_FMT_MEM, self._notify_buf, offset, 121, mem_free_cached())
+        return offset + 5
+
+    def _pack_time(self, offset):
+        now = get_now()
+        js_weekday = now[3] if now[3] < 7 else 0
+        struct.pack_into(_FMT_TIME, self._notify_buf, offset, 131, now[0], now[1], now[2], now[4], now[5], now[6], js_weekday)
+        return offset + 9
+
+    def _pack_schedule(self, offset):
+        data = current_schedule
+        num_blocks = data[2]
+        payload = self._notify_buf
+        payload[offset] = 140
+        payload[offset + 1] = data[0]
+        payload[offset + 2] = num_blocks
+
+        offset += 3
+        for i in range(num_blocks):
+            start_mins, end_mins, recipe_code, enabled = schedule_block(data, i)
+            start_h, start_m = divmod(start_mins, 60); end_h, end_m = divmod(end_mins, 60)
+            struct.pack_into(_FMT_SCHED_BLOCK, payload, offset, start_h, start_m, end_h, end_m, recipe_code, enabled)
+            offset += 6
+        return offset
+
     def notify_memory_update(self):
         if not self.connected: return
-        try:
-            payload = struct.pack("<BI", 121, gc.mem_free())
-            self.ble.gatts_write(self.control_handle, payload)
-            self.ble.gatts_notify(self.conn_handle, self.control_handle)
+        try: self._notify_control(self._pack_memory(0))
         except Exception as e: log_event("ERROR", f"Failed to notify memory: {e}")
 
     def notify_time_update(self):
         if not self.connected: return
-        try:
-            now = rtc.datetime()
-            js_weekday = now[3] if now[3] < 7 else 0
-            payload = struct.pack("<BHBBBBBB", 131, now[0], now[1], now[2], now[4], now[5], now[6], js_weekday)
-            self.ble.gatts_write(self.control_handle, payload)
-            self.ble.gatts_notify(self.conn_handle, self.control_handle)
+        try: self._notify_control(self._pack_time(0))
         except Exception as e: log_event("ERROR", f"Failed to notify time: {e}")
 
     def notify_schedule_data(self):
         if not self.connected: return
         try:
-            blocks = current_schedule.get("blocks", [])
-            num_blocks = len(blocks)
-            payload = bytearray(3 + num_blocks * 6)
-            payload[0] = 140
-            payload[1] = current_schedule.get("version", 1)
-            payload[2] = num_blocks
-            
-            offset = 3
-            for block in blocks:
-                start_mins = block.get("start", 0); end_mins = block.get("end", 0)
-                recipe_name = block.get("recipe", "off"); enabled = 1 if block.get("enabled", False) else 0
-                start_h, start_m = divmod(start_mins, 60); end_h, end_m = divmod(end_mins, 60)
-                recipe_code = config.RECIPE_CODES.get(recipe_name, 0)
-                struct.pack_into("!BBBBBB", payload, offset, start_h, start_m, end_h, end_m, recipe_code, enabled)
-                offset += 6
-            
-            self.ble.gatts_write(self.control_handle, payload)
-            self.ble.gatts_notify(self.conn_handle, self.control_handle)
-            log_event("BLE", f"Notified schedule data with {num_blocks} blocks.")
+            self._notify_control(self._pack_schedule(0))
+            if _DEBUG: log_event("BLE", f"Notified schedule data with {current_schedule[2]} blocks.")
         except Exception as e: log_event("ERROR", f"Failed to notify schedule: {e}")
 
+    def notify_status_bundle(self):
+        """Sends memory, time and schedule as one control notification (code 150).
+
+        Each record keeps its own code byte, so the app splits the bundle by walking it.
+        Falls back to separate notifications when the bundle does not fit the negotiated MTU.
+        """
+        if not self.connected: return
+        try:
+            self._notify_buf[0] = 150
+            end = self._pack_schedule(self._pack_time(self._pack_memory(1)))
+            if end > self.mtu - 3:
+                self.notify_memory_update(); self.notify_time_update(); self.notify_schedule_data(); return
+            self._notify_control(end)
+            if _DEBUG: log_event("BLE", f"Notified status bundle ({end} bytes, {current_schedule[2]} blocks).")
+        except Exception as e: log_event("ERROR", f"Failed to notify status bundle: {e}")
+
 # ---------------------------------------------------------------------------
 # Main Execution Logic
 # ---------------------------------------------------------------------------
-def force_sensor_read_and_update_cache():
-    global last_sensor_read_ms, last_temp_c, last_humidity, last_co2, last_pressure, last_lux
+def csv_row_due(values, now_ms):
+    """True when a CSV row should be written for these readings (see CSV_* settings in config)."""
+    if last_csv_log_ms is None: return True
+    elapsed = time.ticks_diff(now_ms, last_csv_log_ms)
+    if elapsed >= config.CSV_LOG_INTERVAL_MS: return True
+    if elapsed < config.CSV_MIN_INTERVAL_MS: return False
+    for v, prev, eps in zip(values, _last_csv_values, config.CSV_CHANGE_THRESHOLDS):
+        if (v is None) != (prev is None) or (v is not None and abs(v - prev) > eps): return True
+    return False
+
+def force_sensor_read_and_update_cache(force=True):
+    global last_sensor_read_ms, last_csv_log_ms, _last_csv_values, last_temp_c, last_humidity, last_co2, last_pressure, last_lux
     if not sensor_manager: return
     try:
-        sensor_data = sensor_manager.read_all()
+        sensor_data = sensor_manager.read_all(force)
         last_temp_c = sensor_data.get('temperature')
         last_humidity = sensor_data.get('humidity')
         last_co2 = sensor_data.get('co2')
         last_pressure = sensor_data.get('pressure')
         last_lux = sensor_data.get('lux')
         last_sensor_read_ms = time.ticks_ms()
-        if any(v is not None for v in sensor_data.values()):
-            log_sensor_data_csv()
+        values = (last_temp_c, last_humidity, last_co2, last_pressure, last_lux)
+        if any(v is not None for v in values) and csv_row_due(values, last_sensor_read_ms):
+            log_sensor_data_csv(); last_csv_log_ms = last_sensor_read_ms; _last_csv_values = values
     except Exception as e:
         log_event("ERROR", f"Failed during sensor read: {e}")
 
@@ -375,11 +708,70 @@ def check_and_apply_schedule(force=False):
             schedule_active_block = new_block
             apply_schedule_block(schedule_active_block)
 
+# --- Periodic Tasks (uasyncio) ---
+async def ble_task():
+    while True:
+        wait_ms = None
+        if ble_needs_restart and not ble_controller.connected:
+            ble_controller._start_advertising()
+        elif not ble_needs_restart:
+            wait_ms = ble_controller.check_advertising_interval()
+        # Only a failed (re)start needs polling; otherwise sleep until the fast window ends or the IRQ wakes us
+        if ble_needs_restart: wait_ms = config.BT_RESTART_CHECK_INTERVAL_MS
+        if wait_ms is None: await ble_event.wait(); continue
+        try: await asyncio.wait_for_ms(ble_event.wait(), wait_ms)
+        except asyncio.TimeoutError: pass
+
+async def schedule_task():
+    while True:
+        check_and_apply_schedule(force=True)
+        # Sleep straight to the next block boundary (plus a margin to land past it) instead of polling;
+        # a new schedule or clock from BLE ends the wait early
+        wait_ms = ms_until_next_schedule_change()
+        wait_ms = config.SCHEDULE_CHECK_INTERVAL_MS if wait_ms is None else min(wait_ms + 500, config.SCHEDULE_CHECK_INTERVAL_MS)
+        if (_LIGHTSLEEP_WHEN_OFF and wait_ms >= config.LIGHTSLEEP_MIN_MS and
+                not ble_controller.connected and light_controller.is_dark()):
+            # The CYW43 BLE link can't be serviced while the RP2040 is in lightsleep, so power it down around it
+            flush_event_log(); ble_controller.suspend(); slept_from = time.ticks_ms()
+            machine.lightsleep(wait_ms); invalidate_now(); ble_controller.resume()
+            # lightsleep can return early on a wake IRQ; wait out whatever is left with the loop running
+            wait_ms = max(0, wait_ms - time.ticks_diff(time.ticks_ms(), slept_from))
+        try: await asyncio.wait_for_ms(schedule_event.wait(), wait_ms)
+        except asyncio.TimeoutError: pass
+
+async def sensor_task():
+    while True:
+        await asyncio.sleep_ms(config.SENSOR_READ_INTERVAL_MS)
+        force_sensor_read_and_update_cache(force=False)
+        if ble_controller.connected: ble_controller.notify_sensor_data()
+
+async def log_task():
+    while True:
+        try: await asyncio.wait_for_ms(log_event_flag.wait(), config.LOG_FLUSH_INTERVAL_MS)
+        except asyncio.TimeoutError: pass
+        flush_event_log()
+
+async def gc_task():
+    alloc_after_gc = 0
+    while True:
+        alloc = gc.mem_alloc()
+        # An automatic collection may have freed memory since our last one; measure growth from the low point
+        alloc_after_gc = min(alloc_after_gc, alloc)
+        if alloc - alloc_after_gc >= config.GC_MIN_NEW_ALLOC_BYTES:
+            gc.collect(); alloc_after_gc = gc.mem_alloc()
+        await asyncio.sleep_ms(config.GC_INTERVAL_MS)
+
+async def run_tasks():
+    tasks = [light_controller.run(), ble_task(), schedule_task(), log_task(), gc_task()]
+    if sensor_manager: tasks.append(sensor_task())
+    await asyncio.gather(*tasks)
+
 def main():
     global light_controller, ble_controller, sensor_manager
     log_event("SYSTEM", f"--- Controller Startup v{config.VERSION} ---")
     print(f"--- PicoLight Controller v{config.VERSION} ---"); gc.collect()
-    print(f"Initial Memory: {gc.mem_free()} bytes free")
+    print(f"Initial Memory: {mem_free_cached()} bytes free")
+    print(f"INFO: Device name: {config.get_bt_device_name()}")
     load_schedule_from_storage()
     light_controller = LightController(config.PIN_NEOPIXEL, config.NUM_PIXELS)
     
@@ -396,27 +788,19 @@ def main():
     force_sensor_read_and_update_cache()
     
     ble_controller = BluetoothController(light_controller)
-    print("INFO: Applying initial schedule state..."); check_and_apply_schedule(force=True)
     print("--- System Initialized and Ready ---")
     try:
-        while True:
-            if ble_needs_restart and not ble_controller.connected:
-                ble_controller._start_advertising()
-            check_and_apply_schedule()
-            if sensor_manager and time.ticks_diff(time.ticks_ms(), last_sensor_read_ms) >= config.SENSOR_READ_INTERVAL_MS:
-                force_sensor_read_and_update_cache()
-                if ble_controller and ble_controller.connected:
-                    ble_controller.notify_sensor_data()
-            time.sleep_ms(config.MAIN_LOOP_DELAY_MS)
-            gc.collect()
+        asyncio.run(run_tasks())
     except KeyboardInterrupt: log_event("SYSTEM", "Shutdown via KeyboardInterrupt."); print("\nShutdown requested.")
     except Exception as e:
         log_event("FATAL", f"Runtime error: {e}")
-        s = io.StringIO(); sys.print_exception(e, s); log_event("FATAL", "Traceback:\n" + s.getvalue())
+        log_event("FATAL", "Traceback:\n" + format_traceback(e))
         print(f"!!! FATAL RUNTIME ERROR: {e}")
     finally:
-        if light_controller: light_controller.set_recipe_by_name('off')
+        if light_controller: light_controller.blackout()
+        flush_event_log()
         if event_log_file_handle: event_log_file_handle.close()
+        if csv_log_file_handle: csv_log_file_handle.close()
         print("--- Cleanup Complete. System Halted. ---")
 
 if __name__ == "__main__":
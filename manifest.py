@@ -0,0 +1,14 @@
+# manifest.py - Freeze the PicoLight modules into a custom Pico W firmware build
+#
+# Frozen modules run as bytecode straight from flash: nothing is parsed at boot and the
+# code objects stay off the GC heap. Build from a MicroPython checkout with:
+#   make -C ports/rp2 BOARD=RPI_PICO_W FROZEN_MANIFEST=/path/to/this/manifest.py
+# main.py stays on the filesystem (it is what the firmware runs at boot) and imports the rest.
+
+include("$(BOARD_DIR)/manifest.py")  # Keep the board's own frozen modules (network, aioble, ...)
+
+module("unified_sensor.py", opt=3)
+module("pio_neopixel.py", opt=3)
+# config.py holds the per-device service UUID; freeze it only for single-device builds,
+# otherwise keep it (or config.mpy) on the filesystem so each board can be configured.
+# module("config.py", opt=3)
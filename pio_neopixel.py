@@ -0,0 +1,65 @@
+# --- START OF FILE pio_neopixel.py ---
+
+# pio_neopixel.py - RGBW NeoPixel output driven by PIO + DMA (RP2040)
+#
+# Drop-in for the subset of neopixel.NeoPixel that LightController uses (buf, ORDER, write()).
+# The stock driver bit-bangs the waveform on the CPU with interrupts disabled; here a PIO
+# state machine generates the 800 kHz timing and a DMA channel feeds its TX FIFO, so
+# write() only copies the frame and starts the transfer.
+
+import time
+import rp2
+from machine import Pin
+from micropython import const
+
+_PIO0_BASE = const(0x50200000)
+_PIO1_BASE = const(0x50300000)
+_PIO_TXF0 = const(0x010)       # TXF0..TXF3 are consecutive 32-bit registers
+_DREQ_PIO0_TX0 = const(0)      # PIO1 TX DREQs start at 8
+_LATCH_US = const(120)         # Last word still shifting out (~40 us) + >80 us low for the SK6812 latch
+
+@rp2.asm_pio(sideset_init=rp2.PIO.OUT_LOW, out_shiftdir=rp2.PIO.SHIFT_LEFT, autopull=True, pull_thresh=32)
+def _ws2812():
+    wrap_target()
+    label("bitloop")
+    out(x, 1)               .side(0)    [2]
+    jmp(not_x, "do_zero")   .side(1)    [1]
+    jmp("bitloop")          .side(1)    [4]
+    label("do_zero")
+    nop()                   .side(0)    [4]
+    wrap()
+
+class PioNeoPixel:
+    ORDER = (1, 0, 2, 3)  # Same GRBW wire order as neopixel.NeoPixel with bpp=4
+
+    def __init__(self, pin, n, sm_id=0):
+        self.n, self.bpp = n, 4
+        self.buf = bytearray(n * 4)
+        self._dma_buf = bytearray(n * 4)  # DMA reads from a private copy so buf can change mid-transfer
+        # Claim the DMA channel first: if it's unavailable (no rp2.DMA, none free) the caller falls back
+        # to neopixel without a state machine left running the ws2812 program
+        self._dma = rp2.DMA()
+        try:
+            pio, idx = divmod(sm_id, 4)
+            self._txf = (_PIO1_BASE if pio else _PIO0_BASE) + _PIO_TXF0 + idx * 4
+            # 32-bit words, byte-swapped so buf[0] is shifted out first (MSB-first on the wire)
+            self._ctrl = self._dma.pack_ctrl(size=2, inc_read=True, inc_write=False, bswap=True,
+                                             treq_sel=_DREQ_PIO0_TX0 + pio * 8 + idx)
+            self._sm = rp2.StateMachine(sm_id, _ws2812, freq=8_000_000, sideset_base=Pin(pin))
+        except Exception: self._dma.close(); raise
+        self._sm.active(1)
+
+    def __len__(self): return self.n
+
+    def _wait_idle(self):
+        while self._dma.active(): pass
+        while self._sm.tx_fifo(): pass
+        time.sleep_us(_LATCH_US)
+
+    def write(self):
+        self._wait_idle()
+        self._dma_buf[:] = self.buf
+        self._dma.config(read=self._dma_buf, write=self._txf, count=self.n, ctrl=self._ctrl, trigger=True)
+
+    def deinit(self):
+        self._wait_idle(); self._dma.close(); self._sm.active(0)
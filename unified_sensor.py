@@ -11,6 +11,9 @@ import config  # external configuration file
 # --- General Sensor Settings (from config) ---
 SENSOR_READ_INTERVAL_MS = config.SENSOR_READ_INTERVAL_MS
 SENSOR_INIT_DELAY_S = config.SENSOR_INIT_DELAY_S
+SCD4X_READ_INTERVAL_MS = config.SCD4X_READ_INTERVAL_MS
+MPL3115A2_READ_INTERVAL_MS = config.MPL3115A2_READ_INTERVAL_MS
+VEML7700_READ_INTERVAL_MS = config.VEML7700_READ_INTERVAL_MS
 
 # --- I2C Configuration (from config) ---
 I2C_ID = config.I2C_ID
@@ -419,25 +422,38 @@ class UnifiedSensor:
             else:
                  print(f"UnifiedSensor: VEML7700 enabled in config but not found at {hex(VEML7700_I2C_ADDR)}")
 
-        print("UnifiedSensor: Initialization complete.")
-
-    def read_all(self):
-        """Reads data from all enabled and initialized sensors."""
-        sensor_data = {
+        # Last reading of every sensor, and when each sensor was last read (ticks_ms)
+        self._sensor_data = {
             'co2': None,
             'temperature': None,
             'humidity': None,
             'pressure': None,
             'lux': None
         }
+        self._last_read_ms = {}
+
+        print("UnifiedSensor: Initialization complete.")
+
+    def _is_due(self, name, interval_ms, now, force):
+        """Returns True (and marks the sensor as read) if its read interval has elapsed."""
+        last = self._last_read_ms.get(name)
+        if force or last is None or time.ticks_diff(now, last) >= interval_ms:
+            self._last_read_ms[name] = now
+            return True
+        return False
+
+    def read_all(self, force=False):
+        """Reads each enabled sensor whose interval has elapsed (or all if force) and returns the latest data."""
+        sensor_data = self._sensor_data
+        now = time.ticks_ms()
 
         # Read MPL3115A2 first (needed for SCD4X pressure compensation)
-        if self.mpl:
+        if self.mpl and self._is_due('mpl', MPL3115A2_READ_INTERVAL_MS, now, force):
             sensor_data['pressure'] = self.mpl.pressure
             # Optionally read MPL temperature here if needed/implemented
 
         # Read SCD4X (compensate pressure if available)
-        if self.scd4x:
+        if self.scd4x and self._is_due('scd4x', SCD4X_READ_INTERVAL_MS, now, force):
             try:
                 # Set pressure compensation using the value read from MPL (if available)
                 self.scd4x.set_ambient_pressure(sensor_data['pressure'])
@@ -449,17 +465,15 @@ class UnifiedSensor:
                     time.sleep(0.1)
                     ready_attempts -= 1
 
-                if self.scd4x.data_ready:
-                    if self.scd4x.read_measurement():
-                        sensor_data['co2'] = self.scd4x.CO2
-                        sensor_data['temperature'] = self.scd4x.temperature
-                        sensor_data['humidity'] = self.scd4x.relative_humidity
-                    else:
-                        print("UnifiedSensor: SCD4X read_measurement() failed.")
-                        # Values will remain None
+                if self.scd4x.data_ready and self.scd4x.read_measurement():
+                    sensor_data['co2'] = self.scd4x.CO2
+                    sensor_data['temperature'] = self.scd4x.temperature
+                    sensor_data['humidity'] = self.scd4x.relative_humidity
                 else:
-                    print("UnifiedSensor: SCD4X data not ready after waiting.")
-                    # Values will remain None
+                    print("UnifiedSensor: SCD4X data not ready or read_measurement() failed.")
+                    sensor_data['co2'] = None
+                    sensor_data['temperature'] = None
+                    sensor_data['humidity'] = None
             except Exception as e:
                 print(f"UnifiedSensor: Error reading SCD4X: {e}")
                 # Ensure values are None on error
@@ -468,7 +482,7 @@ class UnifiedSensor:
                 sensor_data['humidity'] = None
 
         # Read VEML7700
-        if self.veml:
+        if self.veml and self._is_due('veml', VEML7700_READ_INTERVAL_MS, now, force):
             sensor_data['lux'] = self.veml.lux
 
         return sensor_data